@@ -1,13 +1,17 @@
 # api/routes.py
+import uuid
 import redis
 from flask import Blueprint, request, jsonify, current_app
 from worker.celery_app import celery
+from worker.tasks import build_summary_workflow
 from http import HTTPStatus
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from utils.logger import logger
 from utils.utils import validate_youtube_url
-from common.db import get_from_db, get_transcript_from_db
+from common.config import Config
+from common.db import get_from_db, get_transcript_from_db, get_job_trace, get_recent_job_traces
+from common.trace import JobTrace, stage_durations, aggregate_durations
 
 celery.autodiscover_tasks(["worker.tasks"], force=True)
 api_bp = Blueprint("api", __name__)
@@ -152,18 +156,26 @@ def summarize():
             "status": "completed",
             "result": cached_summary["summary"],
             "settings": cached_summary["settings"],
+            "duplicate_of": cached_summary["duplicate_of"],
             "cached": True,
             "video_id": video_id
         })
 
     try:
         logger.info(f"Cache miss for video ID: {video_id}, starting processing with settings: {settings}")
-        task = celery.signature('worker.tasks.process_video', args=[video_id, settings]).delay()
+        job_id = uuid.uuid4().hex
+        trace = JobTrace(job_id)
+        trace.set(video_id=video_id)
+        trace.mark("enqueued")
+        trace.flush()
+        task = build_summary_workflow(video_id, settings, job_id).apply_async()
         return jsonify({
             "task_id": task.id,
+            "job_id": job_id,
             "status": "processing",
             "video_id": video_id,
             "settings": settings,
+            "timeline_url": f"/api/jobs/{job_id}/timeline",
             "result_url": f"/api/result/{video_id}?length={settings['length']}&language={settings['language']}&{'&'.join(f'focus_areas={area}' for area in settings['focus_areas'])}"
         }), HTTPStatus.ACCEPTED
     except Exception as e:
@@ -193,6 +205,7 @@ def get_result(video_id):
                 "status": "completed",
                 "result": result["summary"],
                 "settings": result["settings"],
+                "duplicate_of": result["duplicate_of"],
                 "video_id": video_id
             })
 
@@ -250,6 +263,49 @@ def get_task_status(task_id):
     return jsonify(result)
 
 
+@api_bp.route("/jobs/<job_id>/timeline", methods=["GET"])
+@limiter.limit("100/day;30/hour")
+def get_job_timeline(job_id):
+    try:
+        trace = get_job_trace(job_id)
+        if not trace:
+            return jsonify({
+                "status": "error",
+                "message": "Job not found"
+            }), HTTPStatus.NOT_FOUND
+
+        marks = trace.get("marks", {})
+        enqueued = marks.get("enqueued", min(marks.values(), default=0))
+        events = [
+            {"event": name, "timestamp_ms": ts, "offset_ms": ts - enqueued}
+            for name, ts in sorted(marks.items(), key=lambda item: item[1])
+        ]
+        if trace.get("error"):
+            status = "failed"
+        elif "save_summary_done" in marks:
+            status = "completed"
+        else:
+            status = "processing"
+        return jsonify({
+            "job_id": job_id,
+            "status": status,
+            "video_id": trace.get("video_id"),
+            "error": trace.get("error"),
+            "events": events,
+            "durations_ms": stage_durations(marks),
+            "retries": trace.get("retries", {}),
+            "llm": trace.get("llm"),
+            "duplicate_of": trace.get("duplicate_of"),
+            "aggregate_ms": aggregate_durations(get_recent_job_traces(Config.JOB_TRACE_SAMPLE_SIZE))
+        })
+    except Exception as e:
+        logger.error(f"Error fetching timeline for job ID: {job_id}, Error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Failed to fetch timeline: {str(e)}"
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
 @api_bp.route("/redis-health", methods=["GET"])
 def redis_health():
     try:
@@ -40,6 +40,17 @@ class Config:
     REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/1')
+    CELERY_RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', '3600'))  # seconds
+
+    # Near-duplicate transcript detection
+    DEDUP_SIMILARITY_THRESHOLD = float(os.getenv('DEDUP_SIMILARITY_THRESHOLD', '0.9'))
+    DEDUP_MIN_SHINGLES = int(os.getenv('DEDUP_MIN_SHINGLES', '50'))  # distinct word 5-grams
+    DEDUP_MAX_COLLISIONS = int(os.getenv('DEDUP_MAX_COLLISIONS', '1000'))  # band matches scanned per lookup
+    DEDUP_MAX_CANDIDATES = int(os.getenv('DEDUP_MAX_CANDIDATES', '20'))  # top-ranked matches verified
+
+    # Job timeline tracing
+    JOB_TRACE_TTL = int(os.getenv('JOB_TRACE_TTL', str(7 * 24 * 3600)))  # seconds
+    JOB_TRACE_SAMPLE_SIZE = int(os.getenv('JOB_TRACE_SAMPLE_SIZE', '1000'))  # jobs used for percentiles
 
     # Flask settings
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
@@ -1,7 +1,11 @@
-from pymongo import MongoClient, ASCENDING, IndexModel
+from pymongo import MongoClient, ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 from datetime import datetime
 from common.config import Config
 from functools import lru_cache
+from common.fingerprint import minhash_signature, lsh_bands, estimate_similarity
+
+INDEX_OPTIONS_CONFLICT = 85
 
 
 @lru_cache(maxsize=None)
@@ -23,21 +27,46 @@ def get_db():
     ]
     db.transcripts.create_indexes(transcripts_indexes)
 
+    fingerprints_indexes = [
+        IndexModel([("video_id", ASCENDING), ("language", ASCENDING)], unique=True),
+        IndexModel([("bands", ASCENDING), ("language", ASCENDING)])
+    ]
+    db.transcript_fingerprints.create_indexes(fingerprints_indexes)
+
+    ensure_ttl_index(db.job_traces, "created_at", Config.JOB_TRACE_TTL)
+
     return db
 
 
-def save_to_db(video_id, settings, summary):
-    db = get_db()
-    normalized_settings = {
+def ensure_ttl_index(collection, field, expire_after_seconds):
+    """Create a TTL index, or update its expiry in place when the configured TTL has changed."""
+    try:
+        collection.create_index([(field, ASCENDING)], expireAfterSeconds=expire_after_seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        collection.database.command(
+            "collMod", collection.name,
+            index={"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds}
+        )
+
+
+def normalize_settings(settings):
+    return {
         "length": settings["length"],
         "focus_areas": sorted(settings["focus_areas"]),  # Sort for consistent lookup
         "language": settings["language"]
     }
+
+
+def save_to_db(video_id, settings, summary, duplicate_of=None):
+    db = get_db()
     db.summaries.update_one(
-        {"video_id": video_id, "settings": normalized_settings},
+        {"video_id": video_id, "settings": normalize_settings(settings)},
         {
             "$set": {
                 "summary": summary,
+                "duplicate_of": duplicate_of,  # Provenance when the summary was copied from a near-duplicate
                 "updated_at": datetime.utcnow()
             }
         },
@@ -48,19 +77,15 @@ def save_to_db(video_id, settings, summary):
 def get_from_db(video_id, settings=None):
     db = get_db()
     if settings:
-        normalized_settings = {
-            "length": settings["length"],
-            "focus_areas": sorted(settings["focus_areas"]),
-            "language": settings["language"]
-        }
-        query = {"video_id": video_id, "settings": normalized_settings}
+        query = {"video_id": video_id, "settings": normalize_settings(settings)}
     else:
         query = {"video_id": video_id}
 
     result = db.summaries.find_one(query)
     return {
         "summary": result["summary"],
-        "settings": result["settings"]
+        "settings": result["settings"],
+        "duplicate_of": result.get("duplicate_of")
     } if result else None
 
 
@@ -76,6 +101,7 @@ def save_transcript_to_db(video_id, language, transcript):
         },
         upsert=True
     )
+    save_fingerprint_to_db(video_id, language, transcript)
 
 
 def get_transcript_from_db(video_id, language='en'):
@@ -85,3 +111,110 @@ def get_transcript_from_db(video_id, language='en'):
         "language": language
     })
     return result["transcript"] if result else None
+
+
+def transcript_exists_in_db(video_id, language='en'):
+    db = get_db()
+    result = db.transcripts.find_one(
+        {"video_id": video_id, "language": language},
+        projection={"_id": 1}
+    )
+    return result is not None
+
+
+def save_fingerprint_to_db(video_id, language, transcript):
+    signature = minhash_signature(transcript)
+    db = get_db()
+    db.transcript_fingerprints.update_one(
+        {"video_id": video_id, "language": language},
+        {
+            "$set": {
+                # Too little content is stored as a marker so it is neither matched nor recomputed
+                "signature": signature,
+                "bands": lsh_bands(signature) if signature else [],
+                "updated_at": datetime.utcnow()
+            }
+        },
+        upsert=True
+    )
+    return signature
+
+
+def get_fingerprint_from_db(video_id, language='en'):
+    """Stored fingerprint document, or None if the transcript has not been fingerprinted yet."""
+    db = get_db()
+    return db.transcript_fingerprints.find_one(
+        {"video_id": video_id, "language": language},
+        projection={"signature": 1}
+    )
+
+
+def find_duplicate_summary(video_id, language, signature, settings):
+    """Find a summary with the same settings for the most similar near-duplicate transcript.
+
+    Runs as one aggregation: at most DEDUP_MAX_COLLISIONS fingerprints sharing an LSH band key are
+    ranked by the number of bands they share, and the top DEDUP_MAX_CANDIDATES that have a summary
+    with these settings are verified against the threshold using their MinHash signatures.
+    """
+    db = get_db()
+    bands = lsh_bands(signature)
+    candidates = db.transcript_fingerprints.aggregate([
+        {"$match": {"bands": {"$in": bands}, "language": language, "video_id": {"$ne": video_id}}},
+        {"$limit": Config.DEDUP_MAX_COLLISIONS},
+        {"$project": {
+            "_id": 0,
+            "video_id": 1,
+            "signature": 1,
+            "shared_bands": {"$size": {"$setIntersection": ["$bands", bands]}}
+        }},
+        {"$sort": {"shared_bands": DESCENDING}},
+        {"$limit": Config.DEDUP_MAX_CANDIDATES},
+        {"$lookup": {
+            "from": "summaries",
+            "let": {"video_id": "$video_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$video_id", "$$video_id"]},
+                            "settings": normalize_settings(settings)}},
+                {"$project": {"_id": 0, "summary": 1}},
+                {"$limit": 1}
+            ],
+            "as": "summaries"
+        }},
+        {"$match": {"summaries": {"$ne": []}}}
+    ])
+
+    best = None
+    for candidate in candidates:
+        similarity = estimate_similarity(signature, candidate["signature"])
+        if similarity >= Config.DEDUP_SIMILARITY_THRESHOLD and (not best or similarity > best["similarity"]):
+            best = {
+                "summary": candidate["summaries"][0]["summary"],
+                "video_id": candidate["video_id"],
+                "similarity": similarity
+            }
+    return best
+
+
+def save_job_trace(job_id, marks, fields=None, first_marks=None, counters=None):
+    db = get_db()
+    to_set = {f"marks.{name}": ts for name, ts in marks.items()}
+    to_set.update(fields or {})
+    update = {"$setOnInsert": {"created_at": datetime.utcnow()}}
+    if to_set:
+        update["$set"] = to_set
+    if first_marks:
+        update["$min"] = {f"marks.{name}": ts for name, ts in first_marks.items()}
+    if counters:
+        update["$inc"] = counters
+    db.job_traces.update_one({"_id": job_id}, update, upsert=True)
+
+
+def get_job_trace(job_id):
+    db = get_db()
+    return db.job_traces.find_one({"_id": job_id})
+
+
+def get_recent_job_traces(limit):
+    db = get_db()
+    cursor = db.job_traces.find({}, projection={"marks": 1}).sort("created_at", DESCENDING).limit(limit)
+    return list(cursor)
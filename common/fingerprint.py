@@ -0,0 +1,55 @@
+import hashlib
+import random
+import re
+from common.config import Config
+
+# MinHash signature of NUM_PERM values split into BANDS bands for LSH; with 16 bands of 8 rows
+# transcripts sharing roughly 70% or more of their shingles are likely to collide in at least one band
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1)  # fixed seed: signatures must be comparable across processes and restarts
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(text):
+    """Word n-grams of the normalized transcript text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text):
+    """MinHash signature of the transcript, or None when it has too little content to fingerprint.
+
+    Near-empty transcripts such as "[Music]" repeated would otherwise all look identical to each other.
+    """
+    hashes = [_hash(shingle) for shingle in shingles(text)]
+    if len(hashes) < Config.DEDUP_MIN_SHINGLES:
+        return None
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_bands(signature):
+    """Band keys used as the lookup index; near-identical transcripts share at least one key."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        keys.append(f"{band}:{_hash(','.join(map(str, rows))):x}")
+    return keys
+
+
+def estimate_similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / NUM_PERM
@@ -0,0 +1,149 @@
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from celery.exceptions import Retry
+from common.db import save_job_trace
+from utils.logger import logger
+
+JOB_ID_HEADER = 'job_id'
+
+# Order in which the summary workflow's tasks run, used to measure broker hand-offs between them
+TASK_SEQUENCE = ("fetch_transcript", "generate_summary", "save_summary")
+TIMED_STAGES = ("transcript_fetch", "transcript_persist", "dedup_lookup", "llm", "persist")
+PERCENTILES = (50, 90, 99)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def job_id_from_request(request):
+    """Read the job id propagated through Celery message headers."""
+    job_id = getattr(request, JOB_ID_HEADER, None)
+    if job_id is None:
+        job_id = (getattr(request, 'headers', None) or {}).get(JOB_ID_HEADER)
+    return job_id
+
+
+class JobTrace:
+    """Collects timeline marks for one job within a process and writes them in a single update."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.marks = {}
+        self.first_marks = {}
+        self.fields = {}
+        self.counters = {}
+
+    def mark(self, name):
+        self.marks[name] = now_ms()
+
+    def mark_first(self, name):
+        """Mark that keeps its earliest value across task attempts."""
+        self.first_marks[name] = now_ms()
+
+    def incr(self, name):
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    @contextmanager
+    def stage(self, name):
+        self.mark(f"{name}_start")
+        try:
+            yield self
+        finally:
+            self.mark(f"{name}_end")
+
+    def flush(self):
+        if not self.job_id or not (self.marks or self.first_marks or self.fields or self.counters):
+            return
+        try:
+            save_job_trace(self.job_id, self.marks, self.fields, self.first_marks, self.counters)
+        except Exception as e:
+            # Tracing must never fail the job it is observing
+            logger.warning(f"Failed to save trace for job {self.job_id}: {str(e)}")
+        self.marks, self.first_marks, self.fields, self.counters = {}, {}, {}, {}
+
+
+@contextmanager
+def task_trace(task):
+    """Trace a Celery task run and flush its marks once when the attempt exits.
+
+    `<task>_dequeued` keeps the first attempt's dequeue time and `<task>_attempt` the latest one, so time
+    lost to retries is reported separately instead of as queue or hand-off time. A retried attempt
+    records `<task>_retry_<n>` rather than `<task>_done`; a task that fails for good also records a
+    failed mark and the error.
+    """
+    trace = JobTrace(job_id_from_request(task.request))
+    task_name = task.name.rsplit('.', 1)[-1]
+    trace.mark_first(f"{task_name}_dequeued")
+    trace.mark(f"{task_name}_attempt")
+    try:
+        yield trace
+    except Retry:
+        trace.mark(f"{task_name}_retry_{task.request.retries + 1}")
+        trace.incr(f"retries.{task_name}")
+        raise
+    except Exception as e:
+        trace.mark(f"{task_name}_failed")
+        trace.set(error={"task": task_name, "type": type(e).__name__, "message": str(e)})
+        trace.mark(f"{task_name}_done")
+        raise
+    else:
+        trace.mark(f"{task_name}_done")
+    finally:
+        trace.flush()
+
+
+def stage_durations(marks):
+    """Derive per-stage durations (ms) from a job's marks; stages that did not run are omitted."""
+    durations = {}
+    dequeued = [marks[f"{task}_dequeued"] for task in TASK_SEQUENCE if f"{task}_dequeued" in marks]
+    if "enqueued" in marks and dequeued:
+        durations["queue"] = min(dequeued) - marks["enqueued"]
+
+    handoffs = [
+        marks[f"{nxt}_dequeued"] - marks[f"{prev}_done"]
+        for prev, nxt in zip(TASK_SEQUENCE, TASK_SEQUENCE[1:])
+        if f"{prev}_done" in marks and f"{nxt}_dequeued" in marks
+    ]
+    if handoffs:
+        durations["handoff"] = sum(handoffs)
+
+    retries = [
+        marks[f"{task}_attempt"] - marks[f"{task}_dequeued"]
+        for task in TASK_SEQUENCE
+        if f"{task}_attempt" in marks and f"{task}_dequeued" in marks
+    ]
+    if any(retries):
+        durations["retry"] = sum(retries)
+
+    for stage in TIMED_STAGES:
+        if f"{stage}_start" in marks and f"{stage}_end" in marks:
+            durations[stage] = marks[f"{stage}_end"] - marks[f"{stage}_start"]
+
+    if "enqueued" in marks and "save_summary_done" in marks:
+        durations["total"] = marks["save_summary_done"] - marks["enqueued"]
+    return durations
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def aggregate_durations(traces):
+    by_stage = defaultdict(list)
+    for trace in traces:
+        for stage, duration in stage_durations(trace.get("marks", {})).items():
+            by_stage[stage].append(duration)
+
+    return {
+        stage: {"count": len(values), **{f"p{pct}": percentile(values, pct) for pct in PERCENTILES}}
+        for stage, values in by_stage.items()
+    }
@@ -13,6 +13,7 @@ celery.conf.update(
     task_serializer='json',
     accept_content=['json'],
     result_serializer='json',
+    result_expires=Config.CELERY_RESULT_EXPIRES,
     timezone='UTC',
     enable_utc=True,
     task_track_started=True,
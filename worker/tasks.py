@@ -2,7 +2,9 @@ from celery import chain
 from youtube_transcript_api import YouTubeTranscriptApi
 from openai import OpenAI
 from common.config import Config
-from common.db import save_to_db, save_transcript_to_db, get_transcript_from_db
+from common.db import (save_to_db, save_transcript_to_db, get_transcript_from_db, transcript_exists_in_db,
+                       get_fingerprint_from_db, save_fingerprint_to_db, find_duplicate_summary)
+from common.trace import JOB_ID_HEADER, task_trace
 from celery.utils.log import get_task_logger
 from worker.celery_app import celery
 
@@ -19,83 +21,128 @@ def get_openai_client():
     return OpenAI(api_key=Config.OPENAI_API_KEY)
 
 
-@celery.task(bind=True, name='worker.tasks.fetch_transcript', retry_backoff=True, max_retries=3)
-def fetch_transcript(self, video_id, language='en'):
-    logger.info(f"Checking transcript for video {video_id} in {language}")
-
-    # Check db first
-    cached_transcript = get_transcript_from_db(video_id, language)
-    if cached_transcript:
-        logger.info(f"Using cached transcript for {video_id}")
-        return cached_transcript
-
-    # Fetch if not in db
-    try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        try:
-            transcript = transcript_list.find_transcript([language])
-        except:
-            logger.info(f"Falling back to English transcript")
-            transcript = transcript_list.find_transcript(['en'])
-            language = 'en'
-
-        transcript_parts = transcript.fetch()
-        transcript_text = " ".join([entry["text"] for entry in transcript_parts])
-        save_transcript_to_db(video_id, language, transcript_text)
-        return transcript_text
-    except Exception as e:
-        logger.error(f"Transcript fetch error: {str(e)}")
-        self.retry(exc=e)
-
+def transcript_ref(video_id, language):
+    """Reference to a stored transcript, passed between tasks instead of the text itself."""
+    return {"video_id": video_id, "language": language}
 
-@celery.task(name='worker.tasks.save_summary')
-def save_summary(summary, video_id, settings):
-    save_to_db(video_id, settings, summary)
-    return {"summary": summary, "settings": settings}
 
+def find_near_duplicate_summary(ref, transcript, settings):
+    """Look up an existing summary for a near-identical transcript, e.g. a re-upload of the same video.
 
-@celery.task(bind=True, name='worker.tasks.process_video', retry_backoff=True, max_retries=3)
-def process_video(self, video_id, settings):
-    logger.info(f"Processing video {video_id}")
+    This is only an optimization: any error is logged and the caller falls back to the LLM.
+    """
     try:
-        # Check if transcript exists first in database
-        cached_transcript = get_transcript_from_db(video_id, settings['language'])
-        if cached_transcript:
-            logger.info(f"Using existing transcript for {video_id}")
-            workflow = chain(
-                generate_summary.s(cached_transcript, settings),
-                save_summary.s(video_id, settings)
-            )
+        fingerprint = get_fingerprint_from_db(ref['video_id'], ref['language'])
+        if fingerprint is None:
+            # Transcripts stored before fingerprinting was added are indexed on first use
+            signature = save_fingerprint_to_db(ref['video_id'], ref['language'], transcript)
         else:
-            workflow = chain(
-                fetch_transcript.s(video_id, settings['language']),
-                generate_summary.s(settings),
-                save_summary.s(video_id, settings)
-            )
-        return workflow.apply_async()
+            signature = fingerprint["signature"]
+        if signature is None:
+            return None
+        return find_duplicate_summary(ref['video_id'], ref['language'], signature, settings)
     except Exception as e:
-        logger.error(f"Video processing error: {str(e)}")
-        self.retry(exc=e)
+        logger.warning(f"Near-duplicate lookup failed for {ref['video_id']}: {str(e)}")
+        return None
 
 
-@celery.task(bind=True, name='worker.tasks.generate_summary', retry_backoff=True, max_retries=2)
-def generate_summary(self, transcript, settings):
-    logger.info("Generating summary with settings: " + str(settings))
-    try:
-        client = get_openai_client()
-        length_map = {
-            "short": "less than 100 words",
-            "medium": "less than 150 words",
-            "long": "less than 300 words"
-        }
-        focus_map = {
-            "technical_details": "technical specifications, methodologies",
-            "key_points": "main arguments, core concepts",
-            "action_items": "actionable steps, recommendations",
-            "balanced_overview": "paragraph with balanced view"
-        }
-        focus_text = ", ".join(focus_map[area] for area in settings['focus_areas']) or "balanced_overview"
-        user_prompt = f"""Generate a {length_map[settings['length']]} summary in {settings['language']} language. Length is very important. Focus on: {focus_text}
+# Failures are still stored so they propagate to the chain's later tasks, whose id the API returns
+@celery.task(bind=True, name='worker.tasks.fetch_transcript', retry_backoff=True, max_retries=3,
+             ignore_result=True, store_errors_even_if_ignored=True)
+def fetch_transcript(self, video_id, language='en'):
+    with task_trace(self) as trace:
+        logger.info(f"Checking transcript for video {video_id} in {language}")
+
+        # Check db first
+        if transcript_exists_in_db(video_id, language):
+            logger.info(f"Using cached transcript for {video_id}")
+            return transcript_ref(video_id, language)
+
+        # Fetch if not in db
+        try:
+            with trace.stage("transcript_fetch"):
+                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+                try:
+                    transcript = transcript_list.find_transcript([language])
+                except:
+                    logger.info(f"Falling back to English transcript")
+                    transcript = transcript_list.find_transcript(['en'])
+                    language = 'en'
+
+                transcript_parts = transcript.fetch()
+            transcript_text = " ".join([entry["text"] for entry in transcript_parts])
+            with trace.stage("transcript_persist"):
+                save_transcript_to_db(video_id, language, transcript_text)
+            return transcript_ref(video_id, language)
+        except Exception as e:
+            logger.error(f"Transcript fetch error: {str(e)}")
+            self.retry(exc=e)
+
+
+@celery.task(bind=True, name='worker.tasks.save_summary')
+def save_summary(self, result, video_id, settings):
+    with task_trace(self) as trace:
+        with trace.stage("persist"):
+            save_to_db(video_id, settings, result["summary"], result["duplicate_of"])
+
+
+def build_summary_workflow(video_id, settings, job_id=None):
+    """Build the summary chain, skipping the transcript fetch when it is already stored.
+
+    The job id is set as a message header on every step so each task can extend the job's timeline.
+    """
+    if transcript_exists_in_db(video_id, settings['language']):
+        logger.info(f"Using existing transcript for {video_id}")
+        steps = [generate_summary.s(transcript_ref(video_id, settings['language']), settings)]
+    else:
+        steps = [
+            fetch_transcript.s(video_id, settings['language']),
+            generate_summary.s(settings)
+        ]
+    steps.append(save_summary.s(video_id, settings))
+
+    if job_id:
+        steps = [step.set(headers={JOB_ID_HEADER: job_id}) for step in steps]
+    return chain(*steps)
+
+
+@celery.task(bind=True, name='worker.tasks.generate_summary', retry_backoff=True, max_retries=2,
+             ignore_result=True, store_errors_even_if_ignored=True)
+def generate_summary(self, ref, settings):
+    with task_trace(self) as trace:
+        logger.info("Generating summary with settings: " + str(settings))
+        try:
+            transcript = get_transcript_from_db(ref['video_id'], ref['language'])
+            if not transcript:
+                raise LookupError(f"Transcript not found for {ref['video_id']} in {ref['language']}")
+
+            with trace.stage("dedup_lookup"):
+                duplicate = find_near_duplicate_summary(ref, transcript, settings)
+            if duplicate:
+                logger.info(f"Reusing summary of near-duplicate video {duplicate['video_id']} "
+                            f"(similarity {duplicate['similarity']:.2f}) for {ref['video_id']}")
+                duplicate_of = {
+                    "video_id": duplicate["video_id"],
+                    "language": ref["language"],
+                    "similarity": duplicate["similarity"]
+                }
+                trace.set(duplicate_of=duplicate_of)
+                return {"summary": duplicate["summary"], "duplicate_of": duplicate_of}
+
+            client = get_openai_client()
+            length_map = {
+                "short": "less than 100 words",
+                "medium": "less than 150 words",
+                "long": "less than 300 words"
+            }
+            focus_map = {
+                "technical_details": "technical specifications, methodologies",
+                "key_points": "main arguments, core concepts",
+                "action_items": "actionable steps, recommendations",
+                "balanced_overview": "paragraph with balanced view"
+            }
+            focus_text = ", ".join(focus_map[area] for area in settings['focus_areas']) or "balanced_overview"
+            user_prompt = f"""Generate a {length_map[settings['length']]} summary in {settings['language']} language. Length is very important. Focus on: {focus_text}
                     Format the response as follows:
                     1. Genre: [one-word genre] (in {settings['language']} language).
                     2. Emotion/tone: [one-word emotion] (in {settings['language']} language).
@@ -103,15 +150,23 @@ def generate_summary(self, transcript, settings):
                     4. Key takeaway: [1-2 line essence of what should be learned] in {settings['language']} language.
                 Here is the transcript: {transcript} in English language."""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system",
-                 "content": "You are an advanced assistant that processes video transcripts to provide detailed insights."},
-                {"role": "user", "content": f"Summarize: {user_prompt}"}
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        logger.error(f"Summary generation error: {str(e)}")
-        self.retry(exc=e)
+            with trace.stage("llm"):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system",
+                         "content": "You are an advanced assistant that processes video transcripts to provide detailed insights."},
+                        {"role": "user", "content": f"Summarize: {user_prompt}"}
+                    ]
+                )
+            if response.usage:
+                trace.set(llm={
+                    "model": response.model,
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens,
+                    "total_tokens": response.usage.total_tokens
+                })
+            return {"summary": response.choices[0].message.content, "duplicate_of": None}
+        except Exception as e:
+            logger.error(f"Summary generation error: {str(e)}")
+            self.retry(exc=e)